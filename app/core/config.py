@@ -18,6 +18,10 @@ class Settings(BaseSettings):
 
     # Engine Settings
     OCR_ENABLED: bool = True
+    # JPEG quality for rendered PDF pages; OCR accuracy is flat well below 95
+    OCR_IMAGE_QUALITY: int = 80
+    # JPEG quality when non-JPEG images (e.g. PNG scans) are transcoded for Mistral upload
+    OCR_UPLOAD_JPEG_QUALITY: int = 90
     DEBUG_MODE: bool = False
 
     # Mistral OCR
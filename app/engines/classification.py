@@ -1,8 +1,11 @@
 import enum
 import re
-from typing import List, Optional, Dict
+from collections import deque
+from functools import lru_cache
+from typing import Deque, List, Optional, Dict, Tuple
+import numpy as np
 from loguru import logger
-from thefuzz import fuzz
+from rapidfuzz import fuzz, process
 from pydantic import BaseModel
 
 
@@ -46,6 +49,84 @@ PAGE_HEADER_MAP = {
 }
 
 
+# Minimum header match score for a page type to become a candidate
+MATCH_THRESHOLD = 0.82
+
+# Number of recent ClassificationResults kept in engine history
+HISTORY_SIZE = 8
+
+# Max number of distinct page texts whose header detection is memoized
+HEADER_CACHE_SIZE = 256
+
+# Pages whose first non-blank lines are all markdown table rows without any
+# long (title-like) words look like table-only continuation pages
+CONTINUATION_HEAD_LINES = 10
+_LONG_WORD_RE = re.compile(r"[A-Za-z]{5,}")
+
+# Markdown decoration stripped from OCR lines before matching
+_MD_STRIP = re.compile(r"[#*_>]+")
+
+def _normalize_title(title: str) -> str:
+    """Same normalization as header lines (see _normalize_line), for titles."""
+    return title.lower().replace(". ", ".").replace(".", "").strip()
+
+
+# Normalized titles, computed once instead of per (line x PageType) pair
+_NORM_TITLES = {
+    p_type: _normalize_title(title) for p_type, title in PAGE_HEADER_MAP.items()
+}
+
+# Frozen (type, title, normalized title) triples eligible for header matching,
+# in PageType order (EMAIL is detected by its footer instead)
+_SCOREABLE_TYPES: Tuple[Tuple[PageType, str, str], ...] = tuple(
+    (p_type, title, _NORM_TITLES[p_type])
+    for p_type, title in PAGE_HEADER_MAP.items()
+    if p_type not in (PageType.UNKNOWN, PageType.EMAIL)
+)
+_SCOREABLE_NORMS = [title_norm for _, _, title_norm in _SCOREABLE_TYPES]
+_SCOREABLE_INDEX = {title_norm: idx for idx, title_norm in enumerate(_SCOREABLE_NORMS)}
+
+# Single alternation over all titles: one regex pass finds every title in a line
+_TITLE_PATTERN = re.compile(
+    "|".join(re.escape(t) for t in sorted(_SCOREABLE_NORMS, key=len, reverse=True))
+)
+
+# All titles in one buffer for the reverse check (line contained in a title)
+_TITLES_JOINED = "\x00".join(_SCOREABLE_NORMS)
+
+# Page X of Y markers, unioned so the header/footer region is scanned once:
+#   "Page 01 of 06", "Page No.: 02 of 08", "Page 1/3", "Sheet No.: 2"
+# Whitespace is limited to a single line, as when lines were searched one by one.
+_PAGE_INFO_RE = re.compile(
+    r"PAGE{ws}(?:NO\.:)?{ws}(?P<num>\d+){ws}OF{ws}(?P<total>\d+)"
+    r"|PAGE{ws}(?P<num_slash>\d+){ws}/{ws}(?P<total_slash>\d+)"
+    r"|SHEET{ws}NO\.:{ws}(?P<sheet>\d+)".format(ws=r"[^\S\n]*"),
+    re.IGNORECASE,
+)
+
+
+def _exact_title_matches(line_norm: str) -> List[Tuple[PageType, str, str]]:
+    """Returns the scoreable types whose title contains, or is contained in, the line."""
+    hits = {_SCOREABLE_INDEX[m.group()] for m in _TITLE_PATTERN.finditer(line_norm)}
+    if line_norm in _TITLES_JOINED:
+        hits.update(
+            idx for idx, title_norm in enumerate(_SCOREABLE_NORMS)
+            if line_norm in title_norm
+        )
+    return [_SCOREABLE_TYPES[idx] for idx in sorted(hits)]
+
+
+@lru_cache(maxsize=4096)
+def _partial_ratio(line_norm: str, title_norm: str) -> float:
+    """
+    Memoized fuzzy score; header lines and titles repeat heavily across pages.
+    Scores below MATCH_THRESHOLD are reported as 0 so rapidfuzz can stop early.
+    """
+    return fuzz.partial_ratio(
+        line_norm, title_norm, score_cutoff=MATCH_THRESHOLD * 100
+    )
+
+
 class ClassificationResult(BaseModel):
     page_type: PageType
     page_num: Optional[int] = None
@@ -67,164 +148,231 @@ class PageClassificationEngine:
     """
 
     def __init__(self):
-        self.history: List[ClassificationResult] = []
+        # Only the last page is consulted, so keep a short bounded window
+        self.history: Deque[ClassificationResult] = deque(maxlen=HISTORY_SIZE)
+        self._header_cache: Dict[
+            str, Tuple[Optional[PageType], float, Optional[str], Dict[str, Optional[int]]]
+        ] = {}
 
-    def _extract_page_info(self, ocr_text: str) -> Dict[str, Optional[int]]:
+    def reset(self):
         """
-        Extracts Page X of Y patterns from OCR text.
+        Clears page history and the detection caches; called per document so
+        pages never inherit from another document and the fuzzy memo stays bounded.
+        """
+        self.history.clear()
+        self._header_cache.clear()
+        _partial_ratio.cache_clear()
+
+    def _extract_page_info(self, lines: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Extracts Page X of Y patterns from the (already split) OCR lines.
         Searches top 20 and bottom 10 lines.
         """
-        lines = ocr_text.splitlines()
-        search_lines = lines[:20] + lines[-10:]
-
-        # Patterns:
-        # "Page 01 of 06"
-        # "Page No.: 02 of 08"
-        # "Page 1 of 3"
-        patterns = [
-            r"PAGE\s*(?:NO\.:)?\s*(\d+)\s*OF\s*(\d+)",
-            r"PAGE\s*(\d+)\s*/\s*(\d+)",
-            r"SHEET\s*NO\.:\s*(\d+)",
-        ]
-
-        for line in search_lines:
-            line_upper = line.upper()
-            for pattern in patterns:
-                match = re.search(pattern, line_upper)
-                if match:
-                    groups = match.groups()
-                    try:
-                        res = {"page_num": int(groups[0])}
-                        if len(groups) > 1:
-                            res["total_pages"] = int(groups[1])
-                        return res
-                    except (ValueError, IndexError):
-                        continue
-        return {"page_num": None, "total_pages": None}
-
-    def get_match_score(self, line: str, title: str) -> float:
+        search_lines = lines if len(lines) <= 30 else lines[:20] + lines[-10:]
+        search_text = "\n".join(search_lines)
+
+        match = _PAGE_INFO_RE.search(search_text)
+        if not match:
+            return {"page_num": None, "total_pages": None}
+
+        page_num = match.group("num") or match.group("num_slash") or match.group("sheet")
+        total_pages = match.group("total") or match.group("total_slash")
+        return {
+            "page_num": int(page_num),
+            "total_pages": int(total_pages) if total_pages else None,
+        }
+
+    @staticmethod
+    def _normalize_line(line: str) -> str:
         """
-        Checks how well 'title' matches 'line'.
-        Returns 0.0 to 1.0.
-        Optimized for clean OCR (like Mistral).
+        Strips markdown symbols (#, *, _, >) and dots so that
+        variants like "Q. C." and "QC" compare equal.
         """
-        if not line or not title:
-            return 0.0
-
-        # Normalization
-        # Strip markdown symbols (#, *, _, >) and common noise
-        line_norm = re.sub(r"[#*_>]+", " ", line).strip().lower()
-        title_norm = title.lower().strip()
-
-        # Handle variants like "Q. C." vs "QC"
-        line_norm = line_norm.replace(". ", ".").replace(".", "")
-        title_norm = title_norm.replace(". ", ".").replace(".", "")
-
+        line_norm = _MD_STRIP.sub(" ", line).strip().lower()
+        # Most header lines carry no dots; skip both replace passes for them
+        if "." not in line_norm:
+            return line_norm
+        return line_norm.replace(". ", ".").replace(".", "")
+
+    @staticmethod
+    def _score_normalized(line_norm: str, title_norm: str) -> float:
+        """Scores an already-normalized line against a normalized title."""
         # 1. Exact Substring Match (Fast & Preferred for Mistral)
         if title_norm in line_norm or line_norm in title_norm:
             return 1.0
 
         # 2. Fuzzy Matching fallback
         # Partial Ratio handles cases where title is part of a longer header line
-        score = fuzz.partial_ratio(line_norm, title_norm) / 100.0
+        return _partial_ratio(line_norm, title_norm) / 100.0
 
-        return score
+    def get_match_score(self, line: str, p_type: PageType) -> float:
+        """
+        Checks how well the header title of 'p_type' matches 'line'.
+        Returns 0.0 to 1.0 (fuzzy scores below MATCH_THRESHOLD read as 0.0).
+        Optimized for clean OCR (like Mistral).
+        """
+        title_norm = _NORM_TITLES.get(p_type)
+        if not line or not title_norm:
+            return 0.0
 
-    def classify(self, ocr_text: str, context: str = "N/A") -> ClassificationResult:
+        return self._score_normalized(self._normalize_line(line), title_norm)
+
+    def _inheritable_previous(self, ocr_text: str) -> Optional[ClassificationResult]:
         """
-        Classifies page with support for positional weighting, context inheritance,
-        and sub-classification (page numbers).
+        Returns the previous result if a headerless page may inherit its type:
+        the page has sufficient text content (> 100 chars) and the previous page
+        is a "Sticky" type (not email/unknown).
         """
-        # --- NUCLEAR DEBUG ---
-        logger.info(f"[{context}] FIRST 200 CHARS: {repr(ocr_text[:200])}")
+        if not self.history or len(ocr_text) <= 100:
+            return None
+        prev_res = self.history[-1]
+        if prev_res.page_type in [PageType.EMAIL, PageType.UNKNOWN]:
+            return None
+        return prev_res
+
+    @staticmethod
+    def _looks_like_continuation(ocr_text: str) -> bool:
+        """
+        Cheap check for table-only continuation pages: every non-blank line
+        among the top CONTINUATION_HEAD_LINES is a table row with no word of
+        5+ letters. Headings, prose and wordy cells could be a (misread)
+        header, title rows included, so those pages get fuzzy scored.
+        """
+        seen = 0
+        for line in ocr_text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("|") or _LONG_WORD_RE.search(line):
+                return False
+            seen += 1
+            if seen >= CONTINUATION_HEAD_LINES:
+                break
+        return True
+
+    def _detect_header(
+        self, ocr_text: str, context: str, use_fuzzy: bool = True
+    ) -> Tuple[Optional[PageType], float, Optional[str], Dict[str, Optional[int]]]:
+        """
+        History-independent part of classification: header match and page info.
+        Returns (page_type, score, matched_line, page_info).
+        With use_fuzzy=False only exact title hits are considered.
+        """
+        # Case-fold and split the text once; every check below reuses these
+        upper_lines = ocr_text.upper().splitlines()
+        lower_text = ocr_text.lower()
 
         # 1. Search top 30 lines (increased depth for Mistral markdown)
-        lines = ocr_text.upper().splitlines()[:30]
+        lines = upper_lines[:30]
 
-        # Collect all valid candidates
-        candidates = []
-        THRESHOLD = 0.82  # Slightly stricter
+        # Candidate hits as (score, title length, -line index, type, line);
+        # the best one is picked with a single max() pass, ties keep the first seen
+        hits = []
+        fuzzy_lines = []  # (index, line, normalized line) without an exact hit
 
         for i, line in enumerate(lines):
             line = line.strip()
             if len(line) < 4:
                 continue
 
-            for p_type in PageType:
-                if p_type in [PageType.UNKNOWN, PageType.EMAIL]:
-                    continue
-
-                title = PAGE_HEADER_MAP.get(p_type)
-                if not title:
-                    continue
-
-                raw_score = self.get_match_score(line, title)
-
-                if raw_score >= THRESHOLD:
-                    # Positional Weighting: Small boost for early lines
-                    position_boost = max(0, (20 - i) / 400.0)
-                    final_score = min(1.0, raw_score + position_boost)
-
-                    candidates.append(
-                        {
-                            "type": p_type,
-                            "title": title,
-                            "score": final_score,
-                            "line": line,
-                            "index": i,
-                        }
-                    )
+            # Normalize each line once, not once per PageType
+            line_norm = self._normalize_line(line)
+
+            # Exact title hits (the common case with Mistral) skip fuzzy scoring.
+            # Their score is already 1.0, so no positional boost applies.
+            exact_types = _exact_title_matches(line_norm)
+            if exact_types:
+                hits.extend(
+                    (1.0, len(title), -i, p_type, line)
+                    for p_type, title, _ in exact_types
+                )
+            elif use_fuzzy:
+                fuzzy_lines.append((i, line, line_norm))
+
+        if fuzzy_lines:
+            # Score every remaining (line x title) pair in one native call
+            cutoff = MATCH_THRESHOLD * 100
+            scores = process.cdist(
+                [line_norm for _, _, line_norm in fuzzy_lines],
+                _SCOREABLE_NORMS,
+                scorer=fuzz.partial_ratio,
+                score_cutoff=cutoff,
+                dtype=np.float64,
+            )
+            # Positional Weighting: Small boost for early lines
+            line_indices = np.array([i for i, _, _ in fuzzy_lines])
+            position_boost = np.maximum(0, (20 - line_indices) / 400.0)
+            final_scores = np.minimum(1.0, scores / 100.0 + position_boost[:, None])
+
+            for row, col in np.argwhere(scores >= cutoff):
+                i, line, _ = fuzzy_lines[row]
+                p_type, title, _ = _SCOREABLE_TYPES[col]
+                hits.append((float(final_scores[row, col]), len(title), -i, p_type, line))
 
         # 2. Refined Email detection (Secondary check)
-        if (
-            "mail.google.com" in ocr_text.lower()
-            or "rishabh metals" in ocr_text.lower()
-        ):
+        if "mail.google.com" in lower_text or "rishabh metals" in lower_text:
             # Check if it's in the extreme top or bottom (headers/footers)
-            header_footer = lines[:5] + ocr_text.upper().splitlines()[-5:]
+            header_footer = lines[:5] + upper_lines[-5:]
             if any("MAIL.GOOGLE.COM" in line_content for line_content in header_footer):
-                # Only add if no stronger header match was found
-                email_score = 0.85
-                candidates.append(
-                    {
-                        "type": PageType.EMAIL,
-                        "title": "Email Signature",
-                        "score": email_score,
-                        "line": "GMAIL_FOOTER",
-                        "index": 99,
-                    }
-                )
+                # Only wins if no stronger header match was found
+                hits.append((0.85, len("Email Signature"), -99, PageType.EMAIL, "GMAIL_FOOTER"))
 
-        # 3. Sort candidates (Score DESC, Title Length DESC, Index ASC)
-        candidates.sort(
-            key=lambda x: (x["score"], len(x["title"]), -x["index"]),
-            reverse=True,
-        )
+        # 3. Pick the best (Score DESC, Title Length DESC, Index ASC)
+        best = max(hits, key=lambda h: h[:3], default=None)
+        best_type = best[3] if best else None
+        best_score = best[0] if best else 0.0
+        best_line = best[4] if best else None
 
-        if candidates:
+        if best_type:
             logger.info(
-                f"[{context}] CANDIDATES: {[(c['type'].name, round(c['score'], 3)) for c in candidates[:3]]}"
+                f"[{context}] BEST CANDIDATE: {best_type.name} ({round(best_score, 3)})"
             )
 
-        best_type = candidates[0]["type"] if candidates else None
-        best_score = candidates[0]["score"] if candidates else 0.0
-        best_line = candidates[0]["line"] if candidates else None
-
         # 4. Extract Sub-Classification (Page X of Y)
-        page_info = self._extract_page_info(ocr_text)
+        page_info = self._extract_page_info(upper_lines)
+
+        return best_type, best_score, best_line, page_info
+
+    def classify(self, ocr_text: str, context: str = "N/A") -> ClassificationResult:
+        """
+        Classifies page with support for positional weighting, context inheritance,
+        and sub-classification (page numbers).
+        """
+        # --- NUCLEAR DEBUG ---
+        logger.info(f"[{context}] FIRST 200 CHARS: {repr(ocr_text[:200])}")
+
+        # 1-4. Header detection depends only on the text, so repeated pages
+        # (re-runs, identical continuation pages) are served from the cache
+        detection = self._header_cache.get(ocr_text)
+        if detection is None:
+            # Continuation pages that can inherit a sticky type skip the fuzzy
+            # sweep; that shortcut depends on history, so it is not cached
+            use_fuzzy = not (
+                self._inheritable_previous(ocr_text)
+                and self._looks_like_continuation(ocr_text)
+            )
+            if not use_fuzzy:
+                logger.debug(f"[{context}] Looks like a continuation page. Skipping fuzzy match.")
+            detection = self._detect_header(ocr_text, context, use_fuzzy=use_fuzzy)
+            if use_fuzzy:
+                if len(self._header_cache) >= HEADER_CACHE_SIZE:
+                    # FIFO eviction: dicts keep insertion order
+                    del self._header_cache[next(iter(self._header_cache))]
+                self._header_cache[ocr_text] = detection
+        else:
+            logger.debug(f"[{context}] Header detection served from cache")
+
+        best_type, best_score, best_line, page_info = detection
 
         # 5. History Inheritance (The "Continuation" Rule)
         if not best_type:
-            # Inheritance Rule: Only inherit if the current page has sufficient text content (> 100 chars)
-            if self.history and len(ocr_text) > 100:
-                prev_res = self.history[-1]
-                # Inherit from previous page only if it's a "Sticky" type (not email/unknown)
-                if prev_res.page_type not in [PageType.EMAIL, PageType.UNKNOWN]:
-                    logger.info(
-                        f"[{context}] No header. Inheriting {prev_res.page_type} from history."
-                    )
-                    best_type = PageType(prev_res.page_type)
-                    best_score = prev_res.score
+            prev_res = self._inheritable_previous(ocr_text)
+            if prev_res:
+                logger.info(
+                    f"[{context}] No header. Inheriting {prev_res.page_type} from history."
+                )
+                best_type = prev_res.page_type
+                best_score = prev_res.score
 
         if not best_type:
             best_type = PageType.UNKNOWN
@@ -1,13 +1,57 @@
 import fitz  # PyMuPDF
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
 from loguru import logger
 import hashlib
+import os
 import shutil
 
 from app.core.config import settings
 
 
+# Render pages at 200% resolution (approx 144 dpi), good for OCR
+_ZOOM_MAT = fitz.Matrix(2.0, 2.0)
+
+# PDFs with fewer pages than this are rendered in-process; below it the
+# cost of starting worker processes outweighs the parallel speedup
+PARALLEL_RENDER_MIN_PAGES = 8
+
+
+def _render_pages(
+    pdf_path: str, images_dir: str, page_nums: List[int], jpg_quality: int
+) -> List[str]:
+    """
+    Renders the given PDF pages to JPEG files and returns their paths.
+    Module-level so it can run in a worker process: PyMuPDF is not
+    thread-safe, so each worker opens its own copy of the document.
+    """
+    pdf_stem = Path(pdf_path).stem
+    image_paths = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in page_nums:
+            pix = doc[page_num].get_pixmap(matrix=_ZOOM_MAT)
+
+            output_filename = f"p{page_num + 1}_{pdf_stem}.jpg"
+            output_path = Path(images_dir) / output_filename
+
+            pix.save(output_path, jpg_quality=jpg_quality)
+            image_paths.append(str(output_path))
+    return image_paths
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """
+    Places src at dest, hardlinking when both are on the same filesystem
+    (no data copied) and falling back to a regular copy otherwise.
+    Only for app-owned sources: a link shares later writes to src.
+    """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
 class IngestionEngine:
     def __init__(self, upload_dir: Path = settings.DATA_DIR / "uploads"):
         self.upload_dir = upload_dir
@@ -16,10 +60,11 @@ class IngestionEngine:
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         self.images_dir.mkdir(parents=True, exist_ok=True)
 
-    def process_file(self, file_path: Path) -> List[str]:
+    def process_file(self, file_path: Path, file_hash: Optional[str] = None) -> List[str]:
         """
         Ingests a PDF or image file.
         Returns a list of paths to the generated page images.
+        Pass file_hash when the caller has already hashed the file.
         """
         file_path = Path(file_path)
         if not file_path.exists():
@@ -27,13 +72,16 @@ class IngestionEngine:
 
         logger.info(f"Ingesting file: {file_path}")
 
-        # Calculate file hash for audit
-        file_hash = self._calculate_file_hash(file_path)
+        # Calculate file hash for audit (unless the caller already did)
+        if file_hash is None:
+            file_hash = self._calculate_file_hash(file_path)
         logger.debug(f"File hash: {file_hash}")
 
         # Copy original to uploads (if not already there)
         dest_path = self.upload_dir / f"{file_hash}{file_path.suffix}"
         if not dest_path.exists():
+            # A real copy (kernel fast-copy where available), never a link: the
+            # caller may later rewrite its file, which must not alter the archive
             shutil.copy2(file_path, dest_path)
 
         generated_images = []
@@ -43,7 +91,9 @@ class IngestionEngine:
         elif file_path.suffix.lower() in [".jpg", ".jpeg", ".png", ".tiff"]:
             # For direct images, just copy/organize them
             image_dest = self.images_dir / f"p1_{file_path.stem}_{file_hash}.jpg"
-            shutil.copy2(file_path, image_dest)
+            # Name carries the content hash, so an existing file is identical
+            if not image_dest.exists():
+                _link_or_copy(dest_path, image_dest)
             generated_images.append(str(image_dest))
         else:
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
@@ -51,28 +101,38 @@ class IngestionEngine:
         return generated_images
 
     def _convert_pdf_to_images(self, pdf_path: Path) -> List[str]:
-        doc = fitz.open(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+
+        logger.info(f"Converting {page_count} pages from {pdf_path.name}")
+
+        quality = settings.OCR_IMAGE_QUALITY
+        workers = min(os.cpu_count() or 1, page_count // PARALLEL_RENDER_MIN_PAGES + 1)
+        if workers < 2:
+            return _render_pages(
+                str(pdf_path), str(self.images_dir), list(range(page_count)), quality
+            )
+
+        # Contiguous page ranges per worker; map() keeps them in page order
+        chunk = -(-page_count // workers)
+        ranges = [
+            list(range(start, min(start + chunk, page_count)))
+            for start in range(0, page_count, chunk)
+        ]
         image_paths = []
-
-        logger.info(f"Converting {len(doc)} pages from {pdf_path.name}")
-
-        for page_num, page in enumerate(doc):
-            # Render page to image (high resolution)
-            zoom = 2.0  # 2.0 = 200% resolution (approx 144 dpi), good for OCR
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-
-            output_filename = f"p{page_num + 1}_{pdf_path.stem}.jpg"
-            output_path = self.images_dir / output_filename
-
-            pix.save(output_path)
-            image_paths.append(str(output_path))
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            for paths in pool.map(
+                _render_pages,
+                [str(pdf_path)] * len(ranges),
+                [str(self.images_dir)] * len(ranges),
+                ranges,
+                [quality] * len(ranges),
+            ):
+                image_paths.extend(paths)
 
         return image_paths
 
     def _calculate_file_hash(self, file_path: Path) -> str:
-        sha256_hash = hashlib.sha256()
+        # file_digest streams the file through hashlib in C with a large buffer
         with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+            return hashlib.file_digest(f, "sha256").hexdigest()
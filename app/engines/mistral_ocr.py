@@ -4,9 +4,14 @@ Implements OCR interface using Mistral AI's cloud OCR API
 """
 
 import os
-import base64
+import re
 import time
 import json
+import random
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Type, Union
 from loguru import logger
@@ -15,8 +20,15 @@ from pydantic import BaseModel
 from mistralai.client import Mistral
 from mistralai.extra import response_format_from_pydantic_model
 import fitz  # PyMuPDF
+import cv2
 from dotenv import load_dotenv
 
+try:
+    import pybase64 as base64  # SIMD base64, drop-in for the stdlib API
+except ImportError:
+    import base64
+
+from app.core.config import settings
 from app.engines.ocr import OCRAdapter, OCRResult
 from app.schemas.template import ROI
 
@@ -24,6 +36,125 @@ from app.schemas.template import ROI
 # Load environment variables
 load_dotenv()
 
+# OCR artifact cleanup, applied to every page's markdown
+_HSPACE_RE = re.compile(r"[^\S\n]+")  # Collapse spaces/tabs but keep \n
+_BLANK_LINES_RE = re.compile(r"\n{3,}")  # Collapse excess blank lines
+_UNDERSCORE_RUN_RE = re.compile(r"[_]{3,}")
+_DOT_RUN_RE = re.compile(r"\.{3,}")
+
+
+# Page OCR markdown, stored as <sha256 of image bytes>.md
+OCR_CACHE_DIR = settings.DATA_DIR / "ocr_cache"
+
+# Read size for streaming base64; a multiple of 3 so chunks encode without padding
+_B64_CHUNK = 3 * 64 * 1024
+
+
+def _file_data_url(path: Union[str, Path], mime_type: str) -> str:
+    """
+    Returns a base64 data URL for a file. Chunks are encoded straight into one
+    preallocated buffer, so the raw file, its encoding and the URL are never
+    all held in memory at once.
+    """
+    prefix = f"data:{mime_type};base64,".encode("ascii")
+    size = os.path.getsize(path)
+    buf = bytearray(len(prefix) + 4 * ((size + 2) // 3))
+    buf[: len(prefix)] = prefix
+    pos = len(prefix)
+    with open(path, "rb") as f:
+        while chunk := f.read(_B64_CHUNK):
+            encoded = base64.b64encode(chunk)
+            buf[pos : pos + len(encoded)] = encoded
+            pos += len(encoded)
+    if pos != len(buf):  # File changed size while reading
+        del buf[pos:]
+    return buf.decode("ascii")
+
+
+def _image_data_url(path: Union[str, Path]) -> str:
+    """
+    Returns a JPEG data URL for an image. Other formats (usually PNG scans) are
+    re-encoded as JPEG first, which is much smaller to encode and upload.
+    """
+    if Path(path).suffix.lower() in (".jpg", ".jpeg"):
+        return _file_data_url(path, "image/jpeg")
+
+    img = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    # JPEG has no alpha or 16-bit support, so those images are sent unchanged
+    if img is not None and img.dtype == "uint8" and (img.ndim == 2 or img.shape[2] == 3):
+        params = [
+            cv2.IMWRITE_JPEG_QUALITY, settings.OCR_UPLOAD_JPEG_QUALITY,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+        ]
+        ok, buf = cv2.imencode(".jpg", img, params)
+        if ok:
+            return "data:image/jpeg;base64," + base64.b64encode(memoryview(buf)).decode("ascii")
+    return _file_data_url(path, "image/png")
+
+
+# API errors that fail the same way on every attempt, so are not retried
+_NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+# Caps (seconds) for computed backoff and for server-sent Retry-After
+_MAX_BACKOFF = 30.0
+_MAX_RETRY_AFTER = 60.0
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying after a failed API call, or None when a
+    retry cannot succeed. Honors Retry-After on 429/503; otherwise uses
+    jittered exponential backoff so concurrent workers don't retry in lockstep.
+    """
+    status = getattr(error, "status_code", None)
+    if status in _NON_RETRYABLE_STATUS:
+        return None
+    if status in (429, 503):
+        response = getattr(error, "raw_response", None)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try:
+            return min(_MAX_RETRY_AFTER, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            pass  # Missing or HTTP-date form: fall back to backoff
+    return random.uniform(0.5, min(_MAX_BACKOFF, 0.5 * 3**attempt))
+
+
+def _file_sha256(path: Union[str, Path]) -> Optional[str]:
+    """Hex SHA-256 of a file's contents, or None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def _write_cache_atomic(cache_file: Path, text: str) -> None:
+    """
+    Writes a cache entry via a temp file in the same directory and os.replace,
+    so concurrent readers see either no file or the complete one.
+    """
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, prefix=f".{cache_file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@lru_cache(maxsize=512)
+def _read_cached_markdown(cache_file: Path) -> str:
+    """
+    Reads a content-addressed OCR result (OCR_CACHE_DIR/<sha256>.md). Those
+    entries never change once written, so hot repeats are served from memory.
+    """
+    with open(cache_file, "r", encoding="utf-8") as f:
+        return f.read()
+
 
 class MistralOCRAdapter(OCRAdapter):
     """
@@ -46,6 +177,8 @@ class MistralOCRAdapter(OCRAdapter):
         self.model = model
         self.timeout = int(os.environ.get("MISTRAL_TIMEOUT", "180")) # seconds
         self.max_retries = int(os.environ.get("MISTRAL_MAX_RETRIES", "3"))
+        # Page OCR requests kept in flight by extract_text_many
+        self.max_concurrency = int(os.environ.get("MISTRAL_MAX_CONCURRENCY", "4"))
 
         if not self.api_key or self.api_key == "your_api_key_here":
             logger.error("Mistral API key not configured!")
@@ -68,14 +201,15 @@ class MistralOCRAdapter(OCRAdapter):
 
         # 1. Check Cache
         img_path_obj = Path(image_path)
-        # Assuming cache is in the same directory with .md extension
-        cache_file = img_path_obj.with_suffix(".md")
+        # Keyed by image content, so renamed re-uploads still hit and a
+        # different image under a reused name never does
+        digest = _file_sha256(image_path)
+        cache_file = OCR_CACHE_DIR / f"{digest}.md" if digest else None
 
-        if cache_file.exists():
+        if cache_file and cache_file.exists():
             try:
                 logger.info(f"Loading cached Mistral OCR for {img_path_obj.name}")
-                with open(cache_file, "r", encoding="utf-8") as f:
-                    cached_text = f.read()
+                cached_text = _read_cached_markdown(cache_file)
                 return OCRResult(cached_text, 1.0)  # High confidence for cache
             except Exception as e:
                 logger.warning(f"Failed to read cache file {cache_file}: {e}")
@@ -86,41 +220,29 @@ class MistralOCRAdapter(OCRAdapter):
             )
 
         try:
-            # Read and encode image
-            with open(image_path, "rb") as f:
-                image_data = base64.b64encode(f.read()).decode("utf-8")
-
-            # Determine image type
-            suffix = img_path_obj.suffix.lower()
-            mime_type = "image/jpeg" if suffix in [".jpg", ".jpeg"] else "image/png"
+            # Read and encode image (as JPEG)
+            image_url = _image_data_url(image_path)
 
             # Call Mistral OCR API with retry logic
-            markdown_text = self._call_mistral_api_with_retry(image_data, mime_type)
+            markdown_text = self._call_mistral_api_with_retry(image_url)
 
             if not markdown_text:
                 return OCRResult("", 0.0)
 
             # Clean OCR artifacts (inline)
-            import re as _re
-
             # Preserve newlines while normalizing horizontal whitespace
-            cleaned_text = _re.sub(
-                r"[^\S\n]+", " ", markdown_text
-            )  # Collapse spaces/tabs but keep \n
-            cleaned_text = _re.sub(
-                r"\n{3,}", "\n\n", cleaned_text
-            )  # Collapse excess blank lines
-            cleaned_text = _re.sub(r"[_]{3,}", "", cleaned_text)
-            cleaned_text = _re.sub(r"\.{3,}", "", cleaned_text).strip()
+            cleaned_text = _HSPACE_RE.sub(" ", markdown_text)
+            cleaned_text = _BLANK_LINES_RE.sub("\n\n", cleaned_text)
+            cleaned_text = _UNDERSCORE_RUN_RE.sub("", cleaned_text)
+            cleaned_text = _DOT_RUN_RE.sub("", cleaned_text).strip()
 
             # 2. Save to Cache
-            try:
-                cache_file.parent.mkdir(parents=True, exist_ok=True)
-                with open(cache_file, "w", encoding="utf-8") as f:
-                    f.write(cleaned_text)
-                logger.info(f"Saved Mistral OCR result to cache: {cache_file.name}")
-            except Exception as e:
-                logger.error(f"Failed to save Mistral OCR result to cache: {e}")
+            if cache_file:
+                try:
+                    _write_cache_atomic(cache_file, cleaned_text)
+                    logger.info(f"Saved Mistral OCR result to cache: {cache_file.name}")
+                except Exception as e:
+                    logger.error(f"Failed to save Mistral OCR result to cache: {e}")
 
             # Return with high confidence
             return OCRResult(cleaned_text, 0.95)
@@ -132,13 +254,26 @@ class MistralOCRAdapter(OCRAdapter):
             logger.error(f"Mistral OCR extraction failed: {e}")
             return OCRResult("", 0.0)
 
-    def _call_mistral_api_with_retry(self, image_data: str, mime_type: str) -> str:
+    def extract_text_many(self, image_paths: List[str]) -> List[OCRResult]:
+        """
+        OCRs several pages with up to max_concurrency requests in flight.
+        The bounded pool is the backpressure; cache hits never reach the API.
+        Results are returned in input order.
+        """
+        workers = min(self.max_concurrency, len(image_paths))
+        if workers <= 1:
+            return [self.extract_text(p) for p in image_paths]
+
+        logger.info(f"Running Mistral OCR for {len(image_paths)} pages ({workers} concurrent)")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.extract_text, image_paths))
+
+    def _call_mistral_api_with_retry(self, image_url: str) -> str:
         """
-        Call Mistral OCR API with exponential backoff retry logic
+        Call Mistral OCR API with jittered exponential backoff retry logic
 
         Args:
-            image_data: Base64-encoded image
-            mime_type: MIME type of the image
+            image_url: Base64 data URL of the image
 
         Returns:
             Markdown text from OCR
@@ -153,7 +288,7 @@ class MistralOCRAdapter(OCRAdapter):
                     model=self.model,
                     document={
                         "type": "image_url",
-                        "image_url": f"data:{mime_type};base64,{image_data}",
+                        "image_url": image_url,
                     },
                 )
 
@@ -169,10 +304,12 @@ class MistralOCRAdapter(OCRAdapter):
             except Exception as e:
                 logger.warning(f"Mistral API call failed (attempt {attempt + 1}): {e}")
 
+                wait_time = _retry_delay(e, attempt)
+                if wait_time is None:
+                    logger.error("Mistral API rejected the request; not retrying")
+                    return ""
                 if attempt < self.max_retries - 1:
-                    # Exponential backoff: 2^attempt seconds
-                    wait_time = 2**attempt
-                    logger.info(f"Retrying in {wait_time} seconds...")
+                    logger.info(f"Retrying in {wait_time:.1f} seconds...")
                     time.sleep(wait_time)
                 else:
                     logger.error("All Mistral API retry attempts exhausted")
@@ -180,6 +317,45 @@ class MistralOCRAdapter(OCRAdapter):
 
         return ""
 
+    def _pdf_document(self, pdf_path: str, reuse: bool = True) -> dict:
+        """
+        OCR document payload for a PDF. The raw file is uploaded to Mistral
+        instead of being sent as base64; with reuse, the file id is cached by
+        content hash so repeat runs skip the upload. Falls back to a data URL
+        if the upload fails.
+        """
+        digest = _file_sha256(pdf_path) if reuse else None
+        id_file = OCR_CACHE_DIR / f"{digest}.fileid" if digest else None
+
+        if id_file and id_file.exists():
+            try:
+                file_id = id_file.read_text(encoding="utf-8").strip()
+                if not self.client.files.retrieve(file_id=file_id).deleted:
+                    logger.info(f"Reusing Mistral upload {file_id} for {Path(pdf_path).name}")
+                    return {"type": "file", "file_id": file_id}
+            except Exception as e:
+                logger.warning(f"Cached Mistral upload unavailable, uploading again: {e}")
+
+        try:
+            with open(pdf_path, "rb") as f:
+                uploaded = self.client.files.upload(
+                    file={"file_name": Path(pdf_path).name, "content": f},
+                    purpose="ocr",
+                )
+        except Exception as e:
+            logger.warning(f"Mistral file upload failed, sending PDF inline: {e}")
+            return {
+                "type": "document_url",
+                "document_url": _file_data_url(pdf_path, "application/pdf"),
+            }
+
+        if id_file:
+            try:
+                _write_cache_atomic(id_file, uploaded.id)
+            except Exception as e:
+                logger.error(f"Failed to cache Mistral upload id: {e}")
+        return {"type": "file", "file_id": uploaded.id}
+
     def extract_structured_data(
         self, image_paths: Union[str, List[str]], schema_class: Type[BaseModel]
     ) -> Optional[dict]:
@@ -213,16 +389,17 @@ class MistralOCRAdapter(OCRAdapter):
             except Exception as e:
                 logger.warning(f"Failed to read cache file {cache_file}: {e}")
 
+        upload_to_delete = None
         try:
             temp_pdf_path = None
             if len(image_paths) == 1:
                 # Single image or PDF
                 image_path = image_paths[0]
-                with open(image_path, "rb") as f:
-                    image_data = base64.b64encode(f.read()).decode("utf-8")
-                
                 suffix = Path(image_path).suffix.lower()
-                mime_type = "application/pdf" if suffix == ".pdf" else ("image/jpeg" if suffix in [".jpg", ".jpeg"] else "image/png")
+                if suffix == ".pdf":
+                    doc_payload = self._pdf_document(image_path)
+                else:
+                    doc_payload = {"type": "image_url", "image_url": _image_data_url(image_path)}
             else:
                 # Multiple images - Merge into PDF
                 logger.info(f"Merging {len(image_paths)} images into temporary PDF for extraction")
@@ -237,11 +414,11 @@ class MistralOCRAdapter(OCRAdapter):
                 doc.save(temp_pdf_path)
                 doc.close()
 
-                with open(temp_pdf_path, "rb") as f:
-                    image_data = base64.b64encode(f.read()).decode("utf-8")
-                mime_type = "application/pdf"
+                # One-off merge: its upload is not reused, and is deleted once done
+                doc_payload = self._pdf_document(temp_pdf_path, reuse=False)
+                upload_to_delete = doc_payload.get("file_id")
                 
-                # Clean up temp PDF immediately after reading into memory
+                # Clean up temp PDF immediately after uploading or reading into memory
                 if os.path.exists(temp_pdf_path):
                     os.remove(temp_pdf_path)
 
@@ -256,14 +433,6 @@ class MistralOCRAdapter(OCRAdapter):
                     # Use the official helper to convert Pydantic to the correct format property
                     annotation_format = response_format_from_pydantic_model(schema_class)
                     
-                    doc_payload = {
-                        "type": "document_url" if mime_type == "application/pdf" else "image_url",
-                    }
-                    if mime_type == "application/pdf":
-                        doc_payload["document_url"] = f"data:{mime_type};base64,{image_data}"
-                    else:
-                        doc_payload["image_url"] = f"data:{mime_type};base64,{image_data}"
-                    
                     response = self.client.ocr.process(
                         model=self.model,
                         document=doc_payload,
@@ -290,8 +459,7 @@ class MistralOCRAdapter(OCRAdapter):
                         
                         # 2. Save to Cache
                         try:
-                            with open(cache_file, "w", encoding="utf-8") as f:
-                                json.dump(structured_json, f, indent=4)
+                            _write_cache_atomic(cache_file, json.dumps(structured_json, indent=4))
                             logger.info(
                                 f"Saved Structured Result to cache: {cache_file.name}"
                             )
@@ -313,8 +481,12 @@ class MistralOCRAdapter(OCRAdapter):
                     logger.warning(
                         f"Mistral Pattern B API call failed (attempt {attempt + 1}): {error_msg}"
                     )
+                    wait_time = _retry_delay(e, attempt)
+                    if wait_time is None:
+                        logger.error("Mistral API rejected the Pattern B request; not retrying")
+                        return None
                     if attempt < self.max_retries - 1:
-                        time.sleep(2**attempt)
+                        time.sleep(wait_time)
                     else:
                         logger.error(
                             "All Mistral API retry attempts exhausted for Pattern B"
@@ -327,6 +499,12 @@ class MistralOCRAdapter(OCRAdapter):
         except Exception as e:
             logger.error(f"Mistral Structured Data extraction failed: {e}")
             return None
+        finally:
+            if upload_to_delete:
+                try:
+                    self.client.files.delete(file_id=upload_to_delete)
+                except Exception as e:
+                    logger.warning(f"Failed to delete Mistral upload {upload_to_delete}: {e}")
 
         return None
 
@@ -345,18 +523,14 @@ class MistralOCRAdapter(OCRAdapter):
             return []
 
         try:
-            # Read and encode PDF
-            with open(pdf_path, "rb") as f:
-                pdf_data = base64.b64encode(f.read()).decode("utf-8")
+            # Upload PDF (or encode it if the upload fails)
+            document = self._pdf_document(pdf_path)
 
             logger.info(f"Processing PDF: {pdf_path}")
 
             response = self.client.ocr.process(
                 model=self.model,
-                document={
-                    "type": "document_url",
-                    "document_url": f"data:application/pdf;base64,{pdf_data}",
-                },
+                document=document,
             )
 
             # Extract markdown from all pages
@@ -19,6 +19,10 @@ class OCRAdapter(ABC):
     def extract_text(self, image_path: str, roi: Optional[ROI] = None) -> OCRResult:
         pass
 
+    def extract_text_many(self, image_paths: List[str]) -> List[OCRResult]:
+        """OCRs several full pages, returning results in input order."""
+        return [self.extract_text(p) for p in image_paths]
+
 
 
 class PaddleOCRAdapter(OCRAdapter):
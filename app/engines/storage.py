@@ -1,7 +1,10 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import create_engine, event, insert, update
+from sqlalchemy.engine import Engine
 from loguru import logger
 from datetime import datetime
+import threading
+from typing import Dict, List
 
 from app.core.config import settings
 from app.models.base import Base
@@ -12,13 +15,68 @@ class DatabaseGateError(Exception):
     pass
 
 
+# One engine (and connection pool) per database URL for the whole process
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[str, sessionmaker] = {}
+# Serializes first-use creation (per-request StorageEngines run on a thread pool)
+_engines_lock = threading.Lock()
+
+# Connection pool sizing for server databases (SQLite keeps its own pooling)
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """WAL lets the API read while an ingestion run is writing."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def get_engine(database_url: str) -> Engine:
+    """
+    Returns the shared engine for 'database_url', creating it (and the tables)
+    on first use. StorageEngine instances are cheap to create per request.
+    """
+    engine = _engines.get(database_url)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        # Another thread may have created it while this one waited
+        engine = _engines.get(database_url)
+        if engine is not None:
+            return engine
+
+        is_sqlite = database_url.startswith("sqlite")
+        if is_sqlite:
+            engine_args = {"connect_args": {"check_same_thread": False}}
+        else:
+            # Pre-ping drops connections the server closed while idle
+            engine_args = {
+                "pool_size": POOL_SIZE,
+                "max_overflow": MAX_OVERFLOW,
+                "pool_pre_ping": True,
+            }
+        engine = create_engine(database_url, **engine_args)
+        if is_sqlite:
+            event.listen(engine, "connect", _enable_sqlite_wal)
+        Base.metadata.create_all(engine)
+        # Committed objects stay loaded instead of being re-SELECTed on access.
+        # The factory is published first, so lock-free readers of _engines find it
+        _session_factories[database_url] = sessionmaker(engine, expire_on_commit=False)
+        _engines[database_url] = engine
+    return engine
+
+
 class StorageEngine:
     def __init__(self):
-        self.engine = create_engine(settings.DATABASE_URL)
-        Base.metadata.create_all(self.engine)
+        self.engine = get_engine(settings.DATABASE_URL)
+        self._session_factory = _session_factories[settings.DATABASE_URL]
 
     def get_session(self) -> Session:
-        return Session(self.engine)
+        """New session on the shared pool; close it (or use it in a with block)."""
+        return self._session_factory()
 
     def save_pending_document(self, db: Session, document: Document):
         """
@@ -55,3 +113,39 @@ class StorageEngine:
         db.add(field)
         db.commit()
         logger.info(f"Field {field.name} verified by {user_id}")
+
+    def commit_verified_batch(self, db: Session, fields: List[Field], user_id: str):
+        """
+        Batch form of commit_verified_data: one bulk AuditLog insert, one
+        UPDATE for all fields and a single commit, instead of a round-trip
+        and commit per field.
+        """
+        if not user_id:
+            raise DatabaseGateError("Cannot commit without a verifier (User ID).")
+        if not fields:
+            return
+
+        db.execute(
+            insert(AuditLog),
+            [
+                {
+                    "field_id": field.id,
+                    "changed_by": user_id,
+                    "previous_value": field.ocr_value,  # Simplified for now
+                    "new_value": field.verified_value,
+                    "reason": "Human verification",
+                }
+                for field in fields
+            ],
+        )
+        db.execute(
+            update(Field)
+            .where(Field.id.in_([field.id for field in fields]))
+            .values(
+                verified_by=user_id,
+                verified_at=datetime.utcnow(),
+                status=VerificationStatus.VERIFIED,
+            )
+        )
+        db.commit()
+        logger.info(f"{len(fields)} fields verified by {user_id}")
@@ -14,6 +14,11 @@ import json
 from datetime import datetime
 from typing import Dict, Any, List, Tuple
 
+# Patterns used on every validated value
+_NUMBER_RE = re.compile(r"[\d.]+")
+_NUMBER_UNIT_RE = re.compile(r"([\d.]+)\s*([a-zA-Z%]+)?")
+_MD_IMAGE_RE = re.compile(r"!\[.*?\]\(.*?\)")
+
 
 class FieldValidator:
     """Validator for individual field values"""
@@ -32,9 +37,7 @@ class FieldValidator:
         cleaned = cleaned.replace("I", "1")  # Capital I -> One
 
         # Extract numeric part (handle cases like "98 CPS" -> "98")
-        import re
-
-        match = re.search(r"[\d.]+", cleaned)
+        match = _NUMBER_RE.search(cleaned)
         if match:
             try:
                 return True, float(match.group())
@@ -96,10 +99,8 @@ class FieldValidator:
         if not value:
             return False, 0, ""
 
-        import re
-
         # Match number and optional word/symbol at end
-        match = re.search(r"([\d.]+)\s*([a-zA-Z%]+)?", value)
+        match = _NUMBER_UNIT_RE.search(value)
         if match:
             try:
                 num = float(match.group(1))
@@ -176,7 +177,7 @@ class FieldValidator:
 
         elif f_type == "signature":
             # Check if it looks like a markdown image: ![...](...)
-            if re.search(r"!\[.*?\]\(.*?\)", value):
+            if _MD_IMAGE_RE.search(value):
                 result["valid"] = True
             else:
                 result["valid"] = False
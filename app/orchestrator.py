@@ -1,7 +1,9 @@
 import re
 from pathlib import Path
+from typing import Optional, Tuple
 from loguru import logger
 import sys
+from PIL import Image
 from sqlalchemy import select
 
 from app.engines.ingestion import IngestionEngine
@@ -23,12 +25,42 @@ from app.schemas.packing_details import PackingDetailsSchema
 from app.schemas.bmr_checklist import BMRChecklistSchema
 from app.schemas.sop import SOPSchema
 from app.schemas.bmr import BMRSchema
-import cv2
 
 # Ensure debug logs are visible
 logger.remove()
 logger.add(sys.stderr, level="DEBUG")
 
+# Date shapes accepted by parse_extracted_date (run for every date field and cell)
+_DMY_DATE_RE = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})")
+_ISO_DATE_RE = re.compile(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})")
+
+# Section prefixes dropped from flattened field names when building labels
+_LABEL_PREFIXES = (
+    "GENERIC_TESTS_",
+    "PAGE_1_TESTS_",
+    "PAGE_3_TESTS_",
+    "PAGE_4_TESTS_",
+    "PAGE_5_TESTS_",
+    "TEST_RESULTS_",
+)
+
+# Pydantic schema used for structured extraction of each page type
+_SCHEMA_MAP = {
+    PageType.QC_TEST_REPORT: QCReportSchema,
+    PageType.WORKSHEET_POLYMER: PolymerWorksheetSchema,
+    PageType.PRODUCTION_REPORT: ProductionReportSchema,
+    PageType.STORES_REQUISITION: StoresRequisitionSchema,
+    PageType.ISSUE_VOUCHER: IssueVoucherSchema,
+    PageType.DEVIATION_ACCEPTANCE: DeviationAcceptanceSchema,
+    PageType.PRODUCT_SPEC: ProductSpecSchema,
+    PageType.EMAIL: EmailSchema,
+    PageType.RM_PACKING_ISSUANCE: RMPackingIssuanceSchema,
+    PageType.PACKING_DETAILS: PackingDetailsSchema,
+    PageType.BMR_CHECKLIST: BMRChecklistSchema,
+    PageType.SOP: SOPSchema,
+    PageType.BMR: BMRSchema,
+}
+
 
 def parse_extracted_date(val: str) -> str:
     """Standardize date formats to DD/MM/YYYY."""
@@ -36,7 +68,7 @@ def parse_extracted_date(val: str) -> str:
         return val
     
     # 1. Try DD/MM/YYYY or DD-MM-YYYY (or 2-digit years)
-    match_dmv = re.search(r"(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})", val)
+    match_dmv = _DMY_DATE_RE.search(val)
     if match_dmv:
         d, m, y = match_dmv.groups()
         if len(y) == 2:
@@ -44,7 +76,7 @@ def parse_extracted_date(val: str) -> str:
         return f"{int(d):02}/{int(m):02}/{y}"
     
     # 2. Try YYYY-MM-DD (ISO)
-    match_iso = re.search(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})", val)
+    match_iso = _ISO_DATE_RE.search(val)
     if match_iso:
         y, m, d = match_iso.groups()
         return f"{int(d):02}/{int(m):02}/{y}"
@@ -52,6 +84,22 @@ def parse_extracted_date(val: str) -> str:
     return val
 
 
+def read_image_size(img_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns (height, width) from the image header without decoding pixels,
+    or None if the file is not a readable image. Like cv2.imread, EXIF
+    rotation is applied, so rotated photos report their displayed size.
+    """
+    try:
+        with Image.open(img_path) as img:
+            w, h = img.size
+            if img.getexif().get(0x0112) in (5, 6, 7, 8):  # Orientation: 90/270
+                w, h = h, w
+    except OSError:
+        return None
+    return h, w
+
+
 def get_field_type(config) -> str:
     if not config:
         return "string"
@@ -137,11 +185,11 @@ class Orchestrator:
                     logger.info("No classified pages found in DB. Clearing and re-running ingestion.")
                     doc.pages.clear()
                     session.commit()
-                    image_paths = self.ingestion.process_file(file_path)
+                    image_paths = self.ingestion.process_file(file_path, file_hash=file_hash)
                     page_data_list = []
             else:
                 # 1. Ingestion (new document)
-                image_paths = self.ingestion.process_file(file_path)
+                image_paths = self.ingestion.process_file(file_path, file_hash=file_hash)
                 doc = Document(filename=file_path_obj.name, file_hash=file_hash)
                 self.storage.save_pending_document(session, doc)
                 page_data_list = []
@@ -150,18 +198,24 @@ class Orchestrator:
             # Populate or complete page_data_list
             if not page_data_list:
                 logger.info(f"Phase 1: Classifying all {len(image_paths)} pages")
+                # Each document starts with no page history and fresh match caches
+                self.classification.reset()
+                # 1a. Read image dimensions
+                readable_pages = []
                 for i, img_path in enumerate(image_paths):
-                    # 1a. Read image dimensions
-                    img = cv2.imread(img_path)
-                    if img is None:
+                    size = read_image_size(img_path)
+                    if size is None:
                         logger.error(f"Failed to read image: {img_path}")
                         continue
-                    h, w = img.shape[:2]
+                    readable_pages.append((i, img_path, size))
 
-                    # 1b. OCR (check cache)
-                    page_ocr_cache = self.ocr_adapter.extract_text(img_path)
-                    
-                    # 1c. Classify
+                # 1b. OCR (check cache), with several pages in flight at once
+                ocr_results = self.ocr_adapter.extract_text_many(
+                    [img_path for _, img_path, _ in readable_pages]
+                )
+
+                for (i, img_path, (h, w)), page_ocr_cache in zip(readable_pages, ocr_results):
+                    # 1c. Classify (in page order; classification uses page history)
                     classification_res = self.classification.classify(
                         page_ocr_cache.text, context=f"{doc.filename} - Page {i + 1}"
                     )
@@ -177,17 +231,19 @@ class Orchestrator:
                     logger.info(f"Page {i+1} classified as {classification_res.page_type}")
             else:
                 # Already have classification, still need OCR text and dimensions for extraction
-                for p_data in page_data_list:
+                ocr_results = self.ocr_adapter.extract_text_many(
+                    [p_data["img_path"] for p_data in page_data_list]
+                )
+                for p_data, page_ocr_cache in zip(page_data_list, ocr_results):
                     img_path = p_data["img_path"]
                     
                     # OCR (cached)
-                    page_ocr_cache = self.ocr_adapter.extract_text(img_path)
                     p_data["ocr_text"] = page_ocr_cache.text
                     
                     # Dimensions
-                    img = cv2.imread(img_path)
-                    if img is not None:
-                        p_data["height"], p_data["width"] = img.shape[:2]
+                    size = read_image_size(img_path)
+                    if size is not None:
+                        p_data["height"], p_data["width"] = size
                     
                     logger.info(f"Page {p_data['index']+1} reusing classification: {p_data['classification'].page_type}")
 
@@ -248,22 +304,7 @@ class Orchestrator:
                 img_paths = [p["img_path"] for p in group]
                 
                 extracted_data = None
-                schema_map = {
-                    PageType.QC_TEST_REPORT: QCReportSchema,
-                    PageType.WORKSHEET_POLYMER: PolymerWorksheetSchema,
-                    PageType.PRODUCTION_REPORT: ProductionReportSchema,
-                    PageType.STORES_REQUISITION: StoresRequisitionSchema,
-                    PageType.ISSUE_VOUCHER: IssueVoucherSchema,
-                    PageType.DEVIATION_ACCEPTANCE: DeviationAcceptanceSchema,
-                    PageType.PRODUCT_SPEC: ProductSpecSchema,
-                    PageType.EMAIL: EmailSchema,
-                    PageType.RM_PACKING_ISSUANCE: RMPackingIssuanceSchema,
-                    PageType.PACKING_DETAILS: PackingDetailsSchema,
-                    PageType.BMR_CHECKLIST: BMRChecklistSchema,
-                    PageType.SOP: SOPSchema,
-                    PageType.BMR: BMRSchema,
-                }
-                schema_cls = schema_map.get(page_type)
+                schema_cls = _SCHEMA_MAP.get(page_type)
                 if schema_cls:
                     extracted_data = self.ocr_adapter.extract_structured_data(img_paths, schema_cls)
 
@@ -308,16 +349,20 @@ class Orchestrator:
     def _add_field(self, session, page, name, value, label=None,
                    field_type="string", sr_no=None, confidence=0.95):
         """Creates and adds a Field record to the session."""
-        if value is None or not str(value).strip():
+        if value is None:
+            return
+        # Stringify once; the emptiness check and ocr_value share it
+        text = str(value).strip()
+        if not text:
             return
         if field_type == "date" and isinstance(value, str):
-            value = parse_extracted_date(value)
+            text = parse_extracted_date(value).strip()
         f = Field(
             page=page,
             name=name,
             label=(label or name.replace("_", " ").title()).strip(": "),
             field_type=field_type,
-            ocr_value=str(value).strip(),
+            ocr_value=text,
             sr_no=sr_no,
             roi_coordinates="0,0,0,0",
             ocr_confidence=confidence,
@@ -403,10 +448,11 @@ class Orchestrator:
                     if "APPEARANCE" in clean_name or "VISCOSITY" in clean_name or "PH" in clean_name:
                          clean_name = clean_name.replace("_COMPLIES", "_COMPLIANCE")
 
-                prefixes_to_strip = ["GENERIC_TESTS_", "PAGE_1_TESTS_", "PAGE_3_TESTS_", "PAGE_4_TESTS_", "PAGE_5_TESTS_", "TEST_RESULTS_"]
-                for p in prefixes_to_strip:
-                    if clean_name.startswith(p):
-                        clean_name = clean_name.replace(p, "")
+                # One tuple startswith() rules out the common no-prefix case
+                if clean_name.startswith(_LABEL_PREFIXES):
+                    for p in _LABEL_PREFIXES:
+                        if clean_name.startswith(p):
+                            clean_name = clean_name.replace(p, "")
                 
                 label = clean_name.replace("_", " ").title().strip()
                 
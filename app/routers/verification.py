@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session, joinedload
 from loguru import logger
 from fastapi.responses import FileResponse
@@ -31,16 +31,22 @@ def get_session():
 @router.get("/documents", response_model=List[DocumentResponse])
 def get_documents(session: Session = Depends(get_session)):
     """List all processed documents with status summary."""
-    docs = session.scalars(select(Document).order_by(Document.id.desc())).all()
+    # Count pages in the same query instead of lazy-loading d.pages per document
+    stmt = (
+        select(Document, func.count(Page.id))
+        .outerjoin(Page, Page.document_id == Document.id)
+        .group_by(Document.id)
+        .order_by(Document.id.desc())
+    )
     return [
         DocumentResponse(
             id=d.id,
             filename=d.filename,
             ingested_at=d.ingested_at or datetime.now(),
             status=d.status,
-            page_count=len(d.pages),
+            page_count=page_count,
         )
-        for d in docs
+        for d, page_count in session.execute(stmt).all()
     ]
 
 
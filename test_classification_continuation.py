@@ -0,0 +1,76 @@
+from app.engines.classification import PageClassificationEngine, PageType
+
+STORES_PAGE = """# STORES REQUISITION SLIP POLYMER PLANT
+
+| Sr | Item | Qty | Unit |
+|----|------|-----|------|
+| 1 | Resin | 25 | kg |
+| 2 | Water | 40 | kg |
+| 3 | Salt | 2 | kg |
+"""
+
+# Slight OCR variants of short titles above tables with short column names
+VARIANT_PAGES = {
+    PageType.ISSUE_VOUCHER: """# ISSUE - MATL VOUCHER
+
+| Sr | Item | Qty | Unit | Lot |
+|----|------|-----|------|-----|
+| 1 | Resin | 25 | kg | A1 |
+| 2 | Water | 40 | kg | B2 |
+""",
+    PageType.PACKING_DETAILS: """# PACKNG DETAILS
+
+| Sr | Bag | Qty | Net | Lot |
+|----|-----|-----|-----|-----|
+| 1 | 12 | 25 | 300 | A1 |
+| 2 | 13 | 25 | 325 | B2 |
+""",
+}
+
+# Title in the first table row, misread by OCR
+TITLE_ROW_PAGE = """| **Pjroductioen Report** | Doc No: QA/F/01 |
+|----|----|
+| Batch | 12 |
+| Date | 01/02/2026 |
+| Qty | 500 kg |
+"""
+
+CONTINUATION_PAGE = """| 4 | Acid | 5 | kg |
+|----|------|-----|------|
+| 5 | Base | 7 | kg |
+| 6 | Dye | 1 | kg |
+| 7 | Oil | 3 | kg |
+| 8 | Gum | 4 | kg |
+"""
+
+
+def test_new_section_after_table_page():
+    """A variant header after another section is still fuzzy-matched."""
+    for expected, text in VARIANT_PAGES.items():
+        engine = PageClassificationEngine()
+        assert engine.classify(STORES_PAGE).page_type == PageType.STORES_REQUISITION
+        result = engine.classify(text)
+        assert result.page_type == expected, (expected, result.page_type)
+        assert result.score >= 0.9
+
+
+def test_title_in_table_row_after_table_page():
+    """A typo'd title inside the first table row is still fuzzy-matched."""
+    engine = PageClassificationEngine()
+    engine.classify(STORES_PAGE)
+    result = engine.classify(TITLE_ROW_PAGE)
+    assert result.page_type == PageType.PRODUCTION_REPORT, result.page_type
+
+
+def test_table_only_page_inherits():
+    engine = PageClassificationEngine()
+    engine.classify(STORES_PAGE)
+    result = engine.classify(CONTINUATION_PAGE)
+    assert result.page_type == PageType.STORES_REQUISITION
+
+
+if __name__ == "__main__":
+    test_new_section_after_table_page()
+    test_title_in_table_row_after_table_page()
+    test_table_only_page_inherits()
+    print("✅ Classification continuation checks passed")
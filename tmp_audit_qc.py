@@ -3,14 +3,17 @@ import sqlite3
 conn = sqlite3.connect('bmr_data.db')
 c = conn.cursor()
 
-# Find QC Report pages
-c.execute("SELECT id, page_number, page_type FROM pages WHERE page_type='QC_TEST_REPORT'")
+# Find QC Report pages with their field counts in one query
+c.execute(
+    "SELECT p.id, p.page_number, p.page_type, COUNT(f.id) FROM pages p "
+    "LEFT JOIN fields f ON f.page_id = p.id "
+    "WHERE p.page_type='QC_TEST_REPORT' GROUP BY p.id"
+)
 pages = c.fetchall()
-print("QC Report pages:", pages)
+print("QC Report pages:", [p[:3] for p in pages])
 
 # Count existing fields
 for p in pages:
-    c.execute("SELECT COUNT(*) FROM fields WHERE page_id=?", (p[0],))
-    print(f"  Page ID {p[0]} has {c.fetchone()[0]} fields")
+    print(f"  Page ID {p[0]} has {p[3]} fields")
 
 conn.close()